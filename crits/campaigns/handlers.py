@@ -1,25 +1,45 @@
+import csv
+import datetime
+import hashlib
+import io
 import json
 
+from multiprocessing.pool import ThreadPool
+
+import pymongo
+from bson import BSON
+from bson.errors import InvalidDocument
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
 from django.conf import settings
 from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.core.urlresolvers import reverse
+from django.core.cache import cache
 try:
     from mongoengine.base import ValidationError
 except ImportError:
     from mongoengine.errors import ValidationError
+try:
+    import bsonjs
+except ImportError:
+    bsonjs = None
 
 from crits.campaigns.campaign import Campaign, EmbeddedTTP
 from crits.campaigns.forms import TTPForm
 from crits.core.class_mapper import class_from_id, class_from_type
 from crits.core.crits_mongoengine import EmbeddedCampaign, json_handler
 from crits.core.handlers import jtable_ajax_list, build_jtable
-from crits.core.handlers import csv_export, get_item_names
+from crits.core.handlers import csv_export, get_item_names, audit_updates
+from crits.core.handlers import get_query, parse_query_request
 from crits.core.mongo_tools import mongo_connector
 from crits.core.user_tools import user_sources, is_user_subscribed
 from crits.core.user_tools import is_user_favorite
 from crits.notifications.handlers import remove_user_from_notification
+from crits.notifications.handlers import generate_update_notification
+from crits.notifications.handlers import generate_update_notifications
 from crits.stats.handlers import generate_campaign_stats
 
 from crits.actors.actor import Actor
@@ -37,11 +57,84 @@ from crits.targets.target import Target
 
 from crits.vocabulary.relationships import RelationshipTypes
 
+# How long (in seconds) to cache the expensive parts of the details page.
+CAMPAIGN_DETAILS_CACHE_TIMEOUT = 60
+
+# Campaign fields that can be exported to CSV straight from the database,
+# without building Campaign documents.
+CSV_STREAM_FIELDS = ('name', 'aliases', 'description', 'status', 'active',
+                     'analyst', 'created', 'modified', 'actor_count',
+                     'backdoor_count', 'domain_count', 'email_count',
+                     'event_count', 'exploit_count', 'indicator_count',
+                     'ip_count', 'pcap_count', 'sample_count')
+
+# The Campaign listing toolbar, built on first use by get_campaign_toolbar().
+campaign_toolbar = None
+
+# Top-level object types counted on the Campaign details page. Only the
+# classes are resolved here; their collections are fetched on first use so
+# importing this module does not need a database connection.
+COUNT_CLASSES = tuple((klass._meta['crits_type'], klass)
+                      for klass in (Actor, Backdoor, Exploit, Sample, PCAP,
+                                    Indicator, Email, Domain, IP, Event))
+
 # Functions for top level Campaigns.
 def get_campaign_names_list(active):
     listing = get_item_names(Campaign, bool(active))
     return [c.name for c in listing]
 
+def get_campaign_counts(campaign_name, sources, analyst):
+    """
+    Count the top-level objects and Targets attributed to a Campaign.
+
+    :param campaign_name: The name of the Campaign to count for.
+    :type campaign_name: str
+    :param sources: The sources the user has access to.
+    :type sources: list
+    :param analyst: The user requesting this information.
+    :type analyst: str
+    :returns: dict of crits_type -> count
+    """
+
+    # Each count is its own round-trip to MongoDB, so run them concurrently
+    # rather than waiting on them one after another.
+    # The counts go straight to the collection to skip building a QuerySet,
+    # and are hinted onto the campaign.name index since the campaign is far
+    # more selective than the user's sources. There is deliberately no
+    # compound (campaign.name, source.name) index: both are arrays and
+    # MongoDB cannot index parallel arrays.
+    formatted_query = {'campaign.name': campaign_name,
+                       'source.name': {'$in': list(sources)}}
+
+    def count_objects(klass):
+        collection = klass._get_collection()
+        try:
+            return collection.count(formatted_query,
+                                    hint=[('campaign.name', pymongo.ASCENDING)])
+        except OperationFailure:
+            # The index has not been created yet (see create_indexes).
+            return collection.count(formatted_query)
+
+    def count_targets():
+        # Finding the addresses is itself two queries, so it runs inside
+        # the pool too rather than ahead of it.
+        uniq_addrs = get_campaign_targets(campaign_name, analyst,
+                                          sources=sources)
+        return Target._get_collection().count(
+            {'email_address': {'$in': list(uniq_addrs)}})
+
+    pool = ThreadPool(processes=len(COUNT_CLASSES) + 1)
+    try:
+        pending = dict((name, pool.apply_async(count_objects, (klass,)))
+                       for name, klass in COUNT_CLASSES)
+        # Item counts for targets
+        pending['Target'] = pool.apply_async(count_targets)
+        counts = dict((k, v.get()) for k, v in pending.iteritems())
+    finally:
+        pool.close()
+        pool.join()
+    return counts
+
 def get_campaign_details(campaign_name, analyst):
     """
     Generate the data to render the Campaign details template.
@@ -54,6 +147,7 @@ def get_campaign_details(campaign_name, analyst):
     """
 
     template = None
+    analyst_name = "%s" % analyst
     sources = user_sources(analyst)
     campaign_detail = Campaign.objects(name=campaign_name).first()
     if not campaign_detail:
@@ -64,24 +158,17 @@ def get_campaign_details(campaign_name, analyst):
     ttp_form = TTPForm()
 
     # remove pending notifications for user
-    remove_user_from_notification("%s" % analyst, campaign_detail.id, 'Campaign')
+    remove_user_from_notification(analyst_name, campaign_detail.id, 'Campaign')
 
     # subscription
     subscription = {
         'type': 'Campaign',
         'id': campaign_detail.id,
-        'subscribed': is_user_subscribed("%s" % analyst,
+        'subscribed': is_user_subscribed(analyst_name,
                                          'Campaign',
                                          campaign_detail.id),
     }
 
-    #objects
-    objects = campaign_detail.sort_objects()
-
-    #relationships
-    relationships = campaign_detail.sort_relationships("%s" % analyst,
-                                                       meta=True)
-
     # relationship
     relationship = {'type': 'Campaign', 'value': campaign_detail.id}
 
@@ -89,25 +176,43 @@ def get_campaign_details(campaign_name, analyst):
     comments = {'comments': campaign_detail.get_comments(),
                 'url_key': campaign_name}
 
-    #screenshots
-    screenshots = campaign_detail.get_screenshots(analyst)
+    # The objects, relationships, screenshots, counts and analysis results
+    # are expensive to build. They only depend on the Campaign (any save
+    # bumps 'modified') and on what sources the user can see, so they are
+    # cached briefly under a key built from both.
+    key_data = u"%s|%s|%s" % (campaign_name,
+                              u",".join(sorted(sources)),
+                              campaign_detail.modified)
+    cache_key = "campaign_details_%s" % hashlib.md5(
+        key_data.encode('utf-8')).hexdigest()
+    cached = cache.get(cache_key)
+    if cached:
+        (objects, relationships, screenshots,
+         counts, service_results) = cached
+    else:
+        #objects
+        objects = campaign_detail.sort_objects()
 
-    # Get item counts
-    formatted_query = {'campaign.name': campaign_name}
-    counts = {}
-    for col_obj in [Actor, Backdoor, Exploit, Sample, PCAP, Indicator, Email, Domain, IP, Event]:
-        counts[col_obj._meta['crits_type']] = col_obj.objects(source__name__in=sources,
-                                                              __raw__=formatted_query).count()
+        #relationships
+        relationships = campaign_detail.sort_relationships(analyst_name,
+                                                           meta=True)
 
-    # Item counts for targets
-    uniq_addrs = get_campaign_targets(campaign_name, analyst)
-    counts['Target'] = Target.objects(email_address__in=uniq_addrs).count()
+        #screenshots
+        screenshots = campaign_detail.get_screenshots(analyst)
 
-    # favorites
-    favorite = is_user_favorite("%s" % analyst, 'Campaign', campaign_detail.id)
+        # Get item counts
+        counts = get_campaign_counts(campaign_name, sources, analyst)
 
-    # analysis results
-    service_results = campaign_detail.get_analysis_results()
+        # analysis results
+        service_results = list(campaign_detail.get_analysis_results())
+
+        cache.set(cache_key,
+                  (objects, relationships, screenshots,
+                   counts, service_results),
+                  CAMPAIGN_DETAILS_CACHE_TIMEOUT)
+
+    # favorites
+    favorite = is_user_favorite(analyst_name, 'Campaign', campaign_detail.id)
 
     args = {'objects': objects,
             'relationships': relationships,
@@ -135,18 +240,18 @@ def get_campaign_stats(campaign):
     # The Statistics collection has a bunch of documents which are not
     # in the same format, so we can't class it at this time.
     stats = mongo_connector(settings.COL_STATISTICS)
-    stat = stats.find_one({"name": "campaign_monthly"})
-    data_list = []
-    if stat:
-        for result in stat["results"]:
-            if campaign == result["campaign"] or campaign == "all":
-                data = {}
-                data["label"] = result["campaign"]
-                data["data"] = []
-                for k in sorted(result["value"].keys()):
-                    data["data"].append([k, result["value"][k]])
-                data_list.append(data)
-    return data_list
+    # Pick out the requested campaign server-side instead of pulling back
+    # the results for every campaign.
+    pipeline = [{"$match": {"name": "campaign_monthly"}},
+                {"$unwind": "$results"}]
+    if campaign != "all":
+        pipeline.append({"$match": {"results.campaign": campaign}})
+    pipeline.append({"$project": {"_id": 0,
+                                  "campaign": "$results.campaign",
+                                  "value": "$results.value"}})
+    return [{"label": result["campaign"],
+             "data": [[k, v] for k, v in sorted(result["value"].iteritems())]}
+            for result in stats.aggregate(pipeline)]
 
 def generate_campaign_csv(request):
     """
@@ -157,9 +262,156 @@ def generate_campaign_csv(request):
     :returns: :class:`django.http.HttpResponse`
     """
 
-    response = csv_export(request, Campaign)
+    # Exports that only ask for plain fields are streamed straight from a
+    # pymongo cursor. Anything else goes through the generic export.
+    opts = parse_query_request(request, Campaign)
+    fields = [f for f in opts['fields'] if f not in ('id', 'schema_version')]
+    sort = opts['sort']
+    if isinstance(sort, basestring):
+        sort = [k for k in sort.split(',') if k]
+    if (not fields or not set(fields).issubset(CSV_STREAM_FIELDS) or
+        not set(k.lstrip('-') for k in sort).issubset(CSV_STREAM_FIELDS)):
+        return csv_export(request, Campaign)
+
+    resp = get_query(Campaign, request)
+    if resp['Result'] == "ERROR":
+        return render_to_response("error.html",
+                                  {"error": resp['Message']},
+                                  RequestContext(request))
+    cursor = Campaign._get_collection().find(resp['query'],
+                                             projection=fields)
+    if sort:
+        cursor = cursor.sort([(k.lstrip('-'),
+                               pymongo.DESCENDING if k.startswith('-')
+                               else pymongo.ASCENDING) for k in sort])
+    cursor = cursor.skip(opts['skip']).limit(opts['limit'])
+
+    response = StreamingHttpResponse(stream_campaign_csv(cursor, fields),
+                                     content_type="text/csv")
+    response['Content-Disposition'] = "attachment;filename=crits-Campaign-export.csv"
     return response
 
+def stream_campaign_csv(cursor, fields, batch_size=1000):
+    """
+    Generate the CSV for a Campaign export from a pymongo cursor, one chunk
+    per batch. Rows match what :func:`crits.core.handlers.csv_export`
+    produces for the same fields.
+
+    :param cursor: The cursor over the raw Campaign documents.
+    :type cursor: :class:`pymongo.cursor.Cursor`
+    :param fields: The fields to write out.
+    :type fields: list
+    :param batch_size: Number of documents per cursor batch and CSV chunk.
+    :type batch_size: int
+    :returns: generator of str
+    """
+
+    # A field missing from the document gets the value MongoEngine would
+    # have given it.
+    defaults = {}
+    for field in fields:
+        default = Campaign._fields[field].default
+        defaults[field] = default() if callable(default) else default
+
+    yield ",".join(fields) + "\n"
+    cursor.batch_size(batch_size)
+    chunk = io.BytesIO()
+    csv_wr = csv.writer(chunk)
+    for count, doc in enumerate(cursor, 1):
+        row = []
+        for field in fields:
+            data = doc.get(field, defaults[field])
+            if field == "aliases":
+                data = ";".join(data)
+            elif not hasattr(data, 'encode'):
+                # Convert non-string data types
+                data = unicode(data)
+            row.append(data.encode('utf-8'))
+        csv_wr.writerow(row)
+        if count % batch_size == 0:
+            yield chunk.getvalue()
+            chunk.seek(0)
+            chunk.truncate()
+    yield chunk.getvalue()
+
+def jtable_json_response(response):
+    """
+    Serialize a jtable response to JSON. Uses python-bsonjs when it is
+    installed since it is much faster than json.dumps() with a default
+    handler, falling back to the latter otherwise. The records have already
+    been flattened to strings by jtable_ajax_list(), so both produce the
+    same output.
+
+    :param response: The jtable response.
+    :type response: dict
+    :returns: :class:`django.http.HttpResponse`
+    """
+
+    if bsonjs:
+        try:
+            return HttpResponse(bsonjs.dumps(BSON.encode(response)),
+                                content_type="application/json")
+        except InvalidDocument:
+            pass
+    return HttpResponse(json.dumps(response,
+                                   default=json_handler),
+                        content_type="application/json")
+
+def get_campaign_toolbar():
+    """
+    Get the jtable toolbar for the Campaign listing. It never changes, so it
+    is only built (and its URL reversed) once per process.
+
+    :returns: list of dicts
+    """
+
+    global campaign_toolbar
+    if campaign_toolbar is None:
+        campaign_toolbar = [
+            {
+                'tooltip': "'All Campaigns'",
+                'text': "'All'",
+                'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes'});}",
+                'cssClass': "'jtable-toolbar-center'",
+            },
+            {
+                'tooltip': "'New Campaigns'",
+                'text': "'New'",
+                'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'New'});}",
+                'cssClass': "'jtable-toolbar-center'",
+            },
+            {
+                'tooltip': "'In Progress Campaigns'",
+                'text': "'In Progress'",
+                'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'In Progress'});}",
+                'cssClass': "'jtable-toolbar-center'",
+            },
+            {
+                'tooltip': "'Analyzed Campaigns'",
+                'text': "'Analyzed'",
+                'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'Analyzed'});}",
+                'cssClass': "'jtable-toolbar-center'",
+            },
+            {
+                'tooltip': "'Deprecated Campaigns'",
+                'text': "'Deprecated'",
+                'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'Deprecated'});}",
+                'cssClass': "'jtable-toolbar-center'",
+            },
+            {
+                'tooltip': "'Refresh campaign stats'",
+                'text': "'Refresh Stats'",
+                'click': "function () {$.get('" + reverse('crits.campaigns.views.campaigns_listing') + "', {'refresh': 'yes'}, function () { $('#campaign_listing').jtable('reload');});}"
+            },
+            {
+                'tooltip': "'Add Campaign'",
+                'text': "'Add Campaign'",
+                'click': "function () {$('#new-campaign').click()}",
+            },
+
+        ]
+    return campaign_toolbar
+
 def generate_campaign_jtable(request, option):
     """
     Generate the jtable data for rendering in the list template.
@@ -199,17 +451,13 @@ def generate_campaign_jtable(request, option):
                         'TotalRecordCount': 0,
                         'Result': 'OK',
                         'msg': ''}
-        return HttpResponse(json.dumps(response,
-                                       default=json_handler),
-                            content_type="application/json")
+        return jtable_json_response(response)
     # Disable campaign removal
     if option == "jtdelete":
         response = {"Result": "ERROR"}
         #if jtable_ajax_delete(obj_type,request):
         #    response = {"Result": "OK"}
-        return HttpResponse(json.dumps(response,
-                                       default=json_handler),
-                            content_type="application/json")
+        return jtable_json_response(response)
     jtopts = {
         'title': "Campaigns",
         'default_sort': mapper['default_sort'],
@@ -221,49 +469,7 @@ def generate_campaign_jtable(request, option):
         'linked_fields': mapper['linked_fields']
     }
     jtable = build_jtable(jtopts, request)
-    jtable['toolbar'] = [
-        {
-            'tooltip': "'All Campaigns'",
-            'text': "'All'",
-            'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes'});}",
-            'cssClass': "'jtable-toolbar-center'",
-        },
-        {
-            'tooltip': "'New Campaigns'",
-            'text': "'New'",
-            'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'New'});}",
-            'cssClass': "'jtable-toolbar-center'",
-        },
-        {
-            'tooltip': "'In Progress Campaigns'",
-            'text': "'In Progress'",
-            'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'In Progress'});}",
-            'cssClass': "'jtable-toolbar-center'",
-        },
-        {
-            'tooltip': "'Analyzed Campaigns'",
-            'text': "'Analyzed'",
-            'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'Analyzed'});}",
-            'cssClass': "'jtable-toolbar-center'",
-        },
-        {
-            'tooltip': "'Deprecated Campaigns'",
-            'text': "'Deprecated'",
-            'click': "function () {$('#campaign_listing').jtable('load', {'refresh': 'yes', 'status': 'Deprecated'});}",
-            'cssClass': "'jtable-toolbar-center'",
-        },
-        {
-            'tooltip': "'Refresh campaign stats'",
-            'text': "'Refresh Stats'",
-            'click': "function () {$.get('" + reverse('crits.%ss.views.%ss_listing' % (type_, type_)) + "', {'refresh': 'yes'}, function () { $('#campaign_listing').jtable('reload');});}"
-        },
-        {
-            'tooltip': "'Add Campaign'",
-            'text': "'Add Campaign'",
-            'click': "function () {$('#new-campaign').click()}",
-        },
-
-    ]
+    jtable['toolbar'] = get_campaign_toolbar()
     # Make count fields clickable to search those listings
     for ctype in ["actor", "backdoor", "exploit", "indicator", "email",
                   "domain", "sample", "event", "ip", "pcap"]:
@@ -313,11 +519,12 @@ def add_campaign(name, description, aliases, analyst,
     :returns: dict with key 'success' (boolean) and 'message' (str).
     """
 
-    # Verify the Campaign does not exist.
-    campaign = Campaign.objects(name=name).first()
-    if campaign:
+    # Verify the Campaign does not exist. Only the id is needed so skip
+    # loading the rest of the Campaign.
+    existing_id = Campaign.objects(name=name).scalar('id').first()
+    if existing_id:
         return {'success': False, 'message': ['Campaign already exists.'],
-                'id': str(campaign.id)}
+                'id': str(existing_id)}
 
     # Create new campaign.
     campaign = Campaign(name=name)
@@ -328,38 +535,32 @@ def add_campaign(name, description, aliases, analyst,
     if ticket:
         campaign.add_ticket(ticket, analyst)
 
-    # Adjust aliases.
+    # Adjust aliases, dropping any that are empty once stripped.
     if isinstance(aliases, basestring):
-        alias_list = aliases.split(',')
-        final_aliases = [a.strip() for a in alias_list]
-    elif isinstance(aliases, list):
-        final_aliases = [a.strip() for a in aliases]
-    else:
-        final_aliases = []
+        aliases = aliases.split(',')
+    elif not isinstance(aliases, (list, tuple)):
+        aliases = []
+    final_aliases = [a.strip() for a in aliases if a and a.strip()]
     campaign.add_alias(final_aliases)
 
     related_obj = None
     if related_id and related_type:
         related_obj = class_from_id(related_type, related_id)
         if not related_obj:
-            retVal['success'] = False
-            retVal['message'] = 'Related Object not found.'
-            return retVal
-
-    campaign.save(username=analyst)
-
-    if related_obj and relationship_type and campaign:
-        relationship_type=RelationshipTypes.inverse(relationship=relationship_type)
-        campaign.add_relationship(related_obj,
-                              relationship_type,
-                              analyst=analyst,
-                              get_rels=False)
-        campaign.save(username=analyst)
-        campaign.reload()
+            return {'success': False, 'message': 'Related Object not found.'}
 
     try:
+        # Everything above only touched the in-memory document. The
+        # relationship needs the Campaign's ObjectId, so a second save is
+        # only made when one is being added.
         campaign.save(username=analyst)
-        campaign.reload()
+        if related_obj and relationship_type:
+            relationship_type=RelationshipTypes.inverse(relationship=relationship_type)
+            campaign.add_relationship(related_obj,
+                                      relationship_type,
+                                      analyst=analyst,
+                                      get_rels=False)
+            campaign.save(username=analyst)
         return {'success': True,
                 'message': 'Campaign created successfully!',
                 'id': str(campaign.id)}
@@ -400,17 +601,28 @@ def add_ttp(cid, ttp, analyst):
               'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(id=cid).first()
+    new_ttp = EmbeddedTTP()
+    new_ttp.analyst = analyst
+    new_ttp.ttp = ttp
+    try:
+        new_ttp.validate()
+    except ValidationError, e:
+        return {'success': False, 'message': "Invalid value: %s" % e}
+
+    # Push the TTP in a single atomic update, guarded so a TTP the
+    # Campaign already has is not added twice (like Campaign.add_ttp()).
+    campaign = Campaign.objects(id=cid, ttps__ttp__ne=ttp).only(
+        'id', 'name', 'ttps').modify(new=True,
+                                     push__ttps=new_ttp,
+                                     set__modified=datetime.datetime.now())
     if campaign:
-        new_ttp = EmbeddedTTP()
-        new_ttp.analyst = analyst
-        new_ttp.ttp = ttp
-        try:
-            campaign.add_ttp(new_ttp)
-            campaign.save(username=analyst)
-            return {'success': True, 'campaign': campaign}
-        except ValidationError, e:
-            return {'success': False, 'message': "Invalid value: %s" % e}
+        audit_updates('Campaign', [campaign.id], analyst, "ttps")
+        generate_update_notification(analyst, campaign, "ttps", [], [new_ttp])
+    else:
+        # Either the Campaign does not exist or it already has this TTP.
+        campaign = Campaign.objects(id=cid).only('id', 'name', 'ttps').first()
+    if campaign:
+        return {'success': True, 'campaign': campaign}
     else:
         return {'success': False, 'message': "Could not find Campaign"}
 
@@ -429,14 +641,23 @@ def edit_ttp(cid, old_ttp, new_ttp, analyst):
     :returns: dict with key 'success' (boolean) and 'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(id=cid).first()
-    if campaign:
-        try:
-            campaign.edit_ttp(old_ttp, new_ttp)
-            campaign.save(username=analyst)
+    if old_ttp and new_ttp:
+        # TTPs are unique per Campaign, so the positional operator only
+        # ever has the one match to update. The Campaign is returned as it
+        # was before the update so the notification can say what changed.
+        campaign = Campaign.objects(id=cid, ttps__ttp=old_ttp).only(
+            'id', 'name', 'ttps').modify(new=False,
+                                         set__ttps__S__ttp=new_ttp,
+                                         set__modified=datetime.datetime.now())
+        if campaign:
+            old = [t for t in campaign.ttps if t.ttp == old_ttp]
+            new = [EmbeddedTTP(analyst=t.analyst, date=t.date, ttp=new_ttp)
+                   for t in old]
+            audit_updates('Campaign', [campaign.id], analyst, "ttps")
+            generate_update_notification(analyst, campaign, "ttps", old, new)
             return {'success': True}
-        except ValidationError, e:
-            return {'success': False, 'message': "Invalid value: %s" % e}
+    if Campaign.objects(id=cid).count():
+        return {'success': True}
     else:
         return {'success': False, 'message': "Could not find Campaign"}
 
@@ -456,14 +677,20 @@ def remove_ttp(cid, ttp, analyst):
               'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(id=cid).first()
+    # Get the Campaign as it was before the update so the notification can
+    # say which TTP was removed, then drop it locally for the caller.
+    campaign = Campaign.objects(id=cid).only('id', 'name', 'ttps').modify(
+        new=False,
+        pull__ttps__ttp=ttp,
+        set__modified=datetime.datetime.now())
     if campaign:
-        try:
-            campaign.remove_ttp(ttp)
-            campaign.save(username=analyst)
-            return {'success': True, 'campaign': campaign}
-        except ValidationError, e:
-            return {'success': False, 'message': "Invalid value: %s" % e}
+        removed = [t for t in campaign.ttps if t.ttp == ttp]
+        if removed:
+            campaign.ttps = [t for t in campaign.ttps if t.ttp != ttp]
+            audit_updates('Campaign', [campaign.id], analyst, "ttps")
+            generate_update_notification(analyst, campaign, "ttps",
+                                         removed, [])
+        return {'success': True, 'campaign': campaign}
     else:
         return {'success': False, 'message': "Could not find Campaign"}
 
@@ -480,7 +707,8 @@ def modify_campaign_aliases(name, tags, analyst):
     :returns: dict with key 'success' (boolean) and 'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(name=name).first()
+    campaign = Campaign.objects(name=name).only('id', 'name',
+                                                'aliases').first()
     if campaign:
         campaign.set_aliases(tags)
         try:
@@ -502,7 +730,8 @@ def activate_campaign(name, analyst):
     :returns: dict with key 'success' (boolean) and 'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(name=name).first()
+    campaign = Campaign.objects(name=name).only('id', 'name',
+                                                'active').first()
     if campaign:
         campaign.activate()
         try:
@@ -524,7 +753,8 @@ def deactivate_campaign(name, analyst):
     :returns: dict with key 'success' (boolean) and 'message' (str) if failed.
     """
 
-    campaign = Campaign.objects(name=name).first()
+    campaign = Campaign.objects(name=name).only('id', 'name',
+                                                'active').first()
     if campaign:
         campaign.deactivate()
         try:
@@ -548,18 +778,103 @@ def campaign_addto_related(crits_object, campaign, analyst):
     :type analyst: str
     """
 
+    if not crits_object.relationships:
+        return
+
+    # The direct updates below skip the checks add_campaign() and save()
+    # made on each related object, so make them once up front.
+    if not campaign.name or not campaign.name.strip():
+        return
+    campaign.confidence = (campaign.confidence or '').strip().lower()
+    if campaign.confidence == '':
+        campaign.confidence = 'low'
+    try:
+        campaign.validate()
+    except ValidationError:
+        return
+
+    # Group the related objects by type so each collection gets one read
+    # and one bulk write, rather than a find and a full save per related
+    # object. As in add_campaign(), the Campaign is attributed if it isn't
+    # there yet, otherwise its confidence is raised if ours is higher.
+    related = {}
     for r in crits_object.relationships:
-        klass = class_from_type(r.rel_type)
+        related.setdefault(r.rel_type, []).append(r.object_id)
+
+    campaign_son = campaign.to_mongo()
+    con = {'low': 1, 'medium': 2, 'high': 3}
+    not_lower = [k for k, v in con.iteritems()
+                 if v >= con.get(campaign.confidence, 0)]
+
+    def add_to_type(item):
+        rel_type, ids = item
+        klass = class_from_type(rel_type)
         if not klass:
-            continue
-        robj = klass.objects(id=str(r.object_id)).first()
-        if not robj:
-            continue
-        robj.add_campaign(campaign)
+            return
+        crits_type = klass._meta['crits_type']
+        collection = klass._get_collection()
+
+        # The read tells us which related objects exist, their sources and
+        # any attribution they already have to this Campaign. That is all
+        # the audit log and notifications need, so nothing is reloaded
+        # after the write.
+        has_source = 'source' in klass._fields
+        projection = {'campaign': {'$elemMatch': {'name': campaign.name}}}
+        if has_source:
+            projection['source.name'] = 1
+        now = datetime.datetime.now()
+        oids = []
+        updates = []
+        changes = {}
+        for doc in collection.find({'_id': {'$in': ids}}, projection):
+            oid = doc['_id']
+            current = doc.get('campaign')
+            if not current:
+                old = []
+                new = [campaign]
+                updates.append(UpdateOne({'_id': oid,
+                                          'campaign.name': {'$ne': campaign.name}},
+                                         {'$push': {'campaign': campaign_son},
+                                          '$set': {'modified': now}}))
+            elif con.get(current[0].get('confidence'), 0) < con[campaign.confidence]:
+                old = [EmbeddedCampaign._from_son(current[0])]
+                new = [EmbeddedCampaign._from_son(current[0])]
+                new[0].confidence = campaign.confidence
+                new[0].analyst = campaign.analyst
+                updates.append(UpdateOne({'_id': oid,
+                                          'campaign': {'$elemMatch': {
+                                              'name': campaign.name,
+                                              'confidence': {'$nin': not_lower}}}},
+                                         {'$set': {'campaign.$.confidence': campaign.confidence,
+                                                   'campaign.$.analyst': campaign.analyst,
+                                                   'modified': now}}))
+            else:
+                continue
+            oids.append(oid)
+            sources = None
+            if has_source:
+                sources = [s.get('name') for s in doc.get('source', [])]
+            changes[oid] = {'old': old, 'new': new, 'sources': sources}
+        if not updates:
+            return
+
+        # Like the save() this replaces, a related object that can't take
+        # the Campaign is skipped rather than failing the attribution.
         try:
-            robj.save(username=analyst)
-        except ValidationError:
-            pass
+            collection.bulk_write(updates, ordered=False)
+        except BulkWriteError, e:
+            for err in e.details.get('writeErrors', []):
+                changes.pop(oids[err['index']], None)
+
+        audit_updates(crits_type, changes.keys(), analyst, "campaign")
+        generate_update_notifications(analyst, crits_type, "campaign", changes)
+
+    pool = ThreadPool(processes=len(related))
+    try:
+        pool.map(add_to_type, related.items())
+    finally:
+        pool.close()
+        pool.join()
 
 # Functions for campaign attribution.
 def campaign_add(campaign_name, confidence, description, related,
@@ -0,0 +1,200 @@
+from bson import ObjectId
+
+from django.test import SimpleTestCase
+
+from crits.campaigns.handlers import campaign_addto_related
+from crits.campaigns.handlers import add_ttp, edit_ttp, remove_ttp
+from crits.core.user import CRITsUser
+from crits.core.user_tools import subscribe_user
+from crits.core.crits_mongoengine import EmbeddedCampaign
+from crits.campaigns.campaign import Campaign
+from crits.notifications.notification import Notification
+from crits.relationships.handlers import forge_relationship
+from crits.vocabulary.relationships import RelationshipTypes
+
+TUSER_NAME = "test_user"
+TUSER_PASS = "!@#j54kfeimn?>S<D"
+TUSER_EMAIL = "test_user@example.com"
+TUSER2_NAME = "second_testUser"
+TUSER2_PASS = "!@#saasdfasfwefwe?>S<Dd"
+TUSER2_EMAIL = "asdfsaser@example.com"
+TCAMPAIGN1 = "Test_Campain1"
+TCAMPAIGN2 = "Test_Campain2"
+TATTRIBUTION = "Test_Attribution"
+TTTP = "Test TTP"
+TTTP_NEW = "Test TTP Edited"
+
+def prep_db():
+    """
+    Prep database for test.
+    """
+    clean_db()
+    # Add User
+    user = CRITsUser.create_user(
+                          username=TUSER_NAME,
+                          password=TUSER_PASS,
+                          email=TUSER_EMAIL,
+                          )
+    user.save()
+    user2 = CRITsUser.create_user(
+                          username=TUSER2_NAME,
+                          password=TUSER2_PASS,
+                          email=TUSER2_EMAIL,
+                          )
+    user2.save()
+    campaign1 = Campaign(name=TCAMPAIGN1)
+    campaign1.save(username=user.username)
+    campaign2 = Campaign(name=TCAMPAIGN2)
+    campaign2.save(username=user.username)
+def clean_db():
+    """
+    Clean database for test.
+    """
+    user = CRITsUser.objects(username=TUSER_NAME).first()
+    if user:
+        user.delete()
+    user2 = CRITsUser.objects(username=TUSER2_NAME).first()
+    if user2:
+        user2.delete()
+    campaign1 = Campaign.objects(name=TCAMPAIGN1).first()
+    if campaign1:
+        Notification.objects(obj_id=campaign1.id).delete()
+        campaign1.delete()
+    campaign2 = Campaign.objects(name=TCAMPAIGN2).first()
+    if campaign2:
+        Notification.objects(obj_id=campaign2.id).delete()
+        campaign2.delete()
+def attribution(confidence, analyst):
+    """
+    Build the Campaign attribution to propagate.
+    """
+    return EmbeddedCampaign(name=TATTRIBUTION,
+                            confidence=confidence,
+                            analyst=analyst)
+class CampaignAddToRelatedTests(SimpleTestCase):
+    """
+    Test Campaign attribution propagation to related objects.
+    """
+    def setUp(self):
+        prep_db()
+        self.user = CRITsUser.objects(username=TUSER_NAME).first()
+        self.user2 = CRITsUser.objects(username=TUSER2_NAME).first()
+        self.campaign1 = Campaign.objects(name=TCAMPAIGN1).first()
+        self.campaign2 = Campaign.objects(name=TCAMPAIGN2).first()
+        forge_relationship(class_=self.campaign1,
+                           right_class=self.campaign2,
+                           rel_type=RelationshipTypes.RELATED_TO,
+                           user=self.user.username)
+        self.campaign1 = Campaign.objects.get(id=self.campaign1.id)
+    def tearDown(self):
+        clean_db()
+    def testNewAttribution(self):
+        self.assertEqual(len(self.campaign2.campaign), 0)
+        campaign_addto_related(self.campaign1,
+                               attribution('medium', self.user.username),
+                               self.user.username)
+        campaign2 = Campaign.objects.get(id=self.campaign2.id)
+        self.assertEqual(len(campaign2.campaign), 1)
+        self.assertEqual(campaign2.campaign[0].name, TATTRIBUTION)
+        self.assertEqual(campaign2.campaign[0].confidence, 'medium')
+        self.assertEqual(campaign2.campaign[0].analyst, self.user.username)
+    def testUpgradeConfidence(self):
+        campaign_addto_related(self.campaign1,
+                               attribution('low', self.user.username),
+                               self.user.username)
+        campaign_addto_related(self.campaign1,
+                               attribution('high', self.user2.username),
+                               self.user2.username)
+        campaign2 = Campaign.objects.get(id=self.campaign2.id)
+        self.assertEqual(len(campaign2.campaign), 1)
+        self.assertEqual(campaign2.campaign[0].confidence, 'high')
+        self.assertEqual(campaign2.campaign[0].analyst, self.user2.username)
+    def testNoDowngradeConfidence(self):
+        campaign_addto_related(self.campaign1,
+                               attribution('high', self.user.username),
+                               self.user.username)
+        campaign_addto_related(self.campaign1,
+                               attribution('low', self.user2.username),
+                               self.user2.username)
+        campaign2 = Campaign.objects.get(id=self.campaign2.id)
+        self.assertEqual(len(campaign2.campaign), 1)
+        self.assertEqual(campaign2.campaign[0].confidence, 'high')
+        self.assertEqual(campaign2.campaign[0].analyst, self.user.username)
+    def testAttributionNotification(self):
+        subscribe_user(self.user2.username, 'Campaign', str(self.campaign2.id))
+        campaign_addto_related(self.campaign1,
+                               attribution('low', self.user.username),
+                               self.user.username)
+        campaign_addto_related(self.campaign1,
+                               attribution('high', self.user.username),
+                               self.user.username)
+        notifications = [n.notification for n in
+                         Notification.objects(obj_id=self.campaign2.id,
+                                              users=self.user2.username)]
+        self.assertEqual(len(notifications), 2)
+        self.assertTrue(any("added: %s" % TATTRIBUTION in n
+                            for n in notifications))
+        self.assertTrue(any("modified: %s" % TATTRIBUTION in n
+                            for n in notifications))
+    def testInvalidAttribution(self):
+        campaign_addto_related(self.campaign1,
+                               attribution('bogus', self.user.username),
+                               self.user.username)
+        campaign_addto_related(self.campaign1,
+                               EmbeddedCampaign(name=' ',
+                                                analyst=self.user.username),
+                               self.user.username)
+        campaign2 = Campaign.objects.get(id=self.campaign2.id)
+        self.assertEqual(len(campaign2.campaign), 0)
+class CampaignTTPTests(SimpleTestCase):
+    """
+    Test Campaign TTP Handlers
+    """
+    def setUp(self):
+        prep_db()
+        self.user = CRITsUser.objects(username=TUSER_NAME).first()
+        self.user2 = CRITsUser.objects(username=TUSER2_NAME).first()
+        self.campaign1 = Campaign.objects(name=TCAMPAIGN1).first()
+        self.cid = str(self.campaign1.id)
+    def tearDown(self):
+        clean_db()
+    def testAddDuplicateTTP(self):
+        result = add_ttp(self.cid, TTTP, self.user.username)
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['campaign'].ttps), 1)
+        result = add_ttp(self.cid, TTTP, self.user.username)
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['campaign'].ttps), 1)
+        campaign1 = Campaign.objects.get(id=self.cid)
+        self.assertEqual([t.ttp for t in campaign1.ttps], [TTTP])
+    def testEditTTP(self):
+        add_ttp(self.cid, TTTP, self.user.username)
+        result = edit_ttp(self.cid, TTTP, TTTP_NEW, self.user.username)
+        self.assertTrue(result['success'])
+        campaign1 = Campaign.objects.get(id=self.cid)
+        self.assertEqual([t.ttp for t in campaign1.ttps], [TTTP_NEW])
+    def testRemoveTTP(self):
+        add_ttp(self.cid, TTTP, self.user.username)
+        result = remove_ttp(self.cid, TTTP, self.user.username)
+        self.assertTrue(result['success'])
+        self.assertEqual(len(result['campaign'].ttps), 0)
+        campaign1 = Campaign.objects.get(id=self.cid)
+        self.assertEqual(len(campaign1.ttps), 0)
+    def testTTPNotifications(self):
+        subscribe_user(self.user2.username, 'Campaign', self.cid)
+        add_ttp(self.cid, TTTP, self.user.username)
+        remove_ttp(self.cid, TTTP, self.user.username)
+        notifications = [n.notification for n in
+                         Notification.objects(obj_id=self.campaign1.id,
+                                              users=self.user2.username)]
+        self.assertEqual(len(notifications), 2)
+        self.assertTrue(any("Added to ttps" in n for n in notifications))
+        self.assertTrue(any("Removed from ttps" in n for n in notifications))
+    def testUnknownCampaign(self):
+        cid = str(ObjectId())
+        result = add_ttp(cid, TTTP, self.user.username)
+        self.assertFalse(result['success'])
+        result = edit_ttp(cid, TTTP, TTTP_NEW, self.user.username)
+        self.assertFalse(result['success'])
+        result = remove_ttp(cid, TTTP, self.user.username)
+        self.assertFalse(result['success'])
@@ -3946,6 +3946,33 @@ def audit_entry(self, username, type_, new_doc=False):
     # Generate audit notification
     generate_audit_notification(username, type_, self, changed_fields, what_changed, new_doc)
 
+def audit_updates(crits_type, ids, analyst, changed):
+    """
+    Record the audit log entries a save() would have left for top-level
+    objects that were changed with a direct database update instead.
+
+    :param crits_type: The CRITs type of the updated objects.
+    :type crits_type: str
+    :param ids: The ObjectIds of the updated objects.
+    :type ids: list
+    :param analyst: The user who made the change.
+    :type analyst: str
+    :param changed: The field(s) that changed.
+    :type changed: str
+    """
+
+    if not analyst or not ids:
+        return
+    version = AuditLog._meta['latest_schema_version']
+    AuditLog.objects.insert([AuditLog(user=analyst,
+                                      target_type=crits_type,
+                                      target_id=oid,
+                                      value=changed,
+                                      method="save()",
+                                      schema_version=version)
+                             for oid in ids],
+                            load_bulk=False)
+
 def ticket_add(type_, id_, ticket, user, **kwargs):
     """
     Add a ticket to a top-level object.
@@ -73,6 +73,9 @@ def create_indexes():
 
     print "Creating indexes (duplicates will be ignored automatically)"
 
+    actors = mongo_connector(settings.COL_ACTORS)
+    actors.ensure_index("campaign.name", background=True)
+
     analysis_results = mongo_connector(settings.COL_ANALYSIS_RESULTS)
     analysis_results.ensure_index("service_name", background=True)
     analysis_results.ensure_index("object_type", background=True)
@@ -87,6 +90,7 @@ def create_indexes():
 
     backdoors = mongo_connector(settings.COL_BACKDOORS)
     backdoors.ensure_index("name", background=True)
+    backdoors.ensure_index("campaign.name", background=True)
 
     campaigns = mongo_connector(settings.COL_CAMPAIGNS)
     campaigns.ensure_index("objects.value", background=True)
@@ -132,6 +136,7 @@ def create_indexes():
 
     exploits = mongo_connector(settings.COL_EXPLOITS)
     exploits.ensure_index("name", background=True)
+    exploits.ensure_index("campaign.name", background=True)
 
     indicators = mongo_connector(settings.COL_INDICATORS)
     indicators.ensure_index("value", background=True)
@@ -8,7 +8,6 @@ try:
     from mongoengine.base import ValidationError
 except ImportError:
     from mongoengine.errors import ValidationError
-from mongoengine.base.datastructures import BaseList
 from mongoengine.queryset import Q
 
 from crits.core.class_mapper import class_from_id
@@ -224,6 +223,146 @@ def generate_audit_notification(username, operation_type, obj, changed_fields,
         message = html_escape(message)
         create_notification(obj, username, message, source_filter, NotificationType.ALERT)
 
+def generate_update_notification(username, obj, changed_field, old_value,
+                                 new_value):
+    """
+    Generate an audit notification for a field that was changed with a
+    direct database update instead of a save(). Unlike
+    generate_audit_notification() the change is described from the values
+    passed in, so this can be called after the update has been written.
+
+    :param username: The user creating the notification.
+    :type username: str
+    :param obj: The object.
+    :type obj: class which inherits from
+               :class:`crits.core.crits_mongoengine.CritsBaseAttributes`
+    :param changed_field: The name of the field that was changed.
+    :type changed_field: str
+    :param old_value: The value of the field before the update.
+    :param new_value: The value of the field after the update.
+    """
+
+    obj_type = obj._meta['crits_type']
+
+    # Check if the obj is supported for notifications
+    if __supported_notification_types__.get(obj_type) is None:
+        return
+
+    message = "%s updated the following attributes: %s" % (username,
+                                                           changed_field)
+    change = process_changed_field(obj_type, changed_field,
+                                   old_value, new_value)
+
+    if change.get('message') is not None:
+        message += "\n" + change.get('message')
+
+    create_notification(obj, username, html_escape(message),
+                        change.get('source_filter'), NotificationType.ALERT)
+
+def generate_update_notifications(username, obj_type, changed_field,
+                                  changes):
+    """
+    Generate audit notifications for many objects of one type that had the
+    same field changed with direct database updates. Works like
+    generate_update_notification() for each object, but finds the
+    subscribed users for all of them with a single query and writes the
+    notifications in one insert.
+
+    :param username: The user creating the notifications.
+    :type username: str
+    :param obj_type: The CRITs type of the objects.
+    :type obj_type: str
+    :param changed_field: The name of the field that was changed.
+    :type changed_field: str
+    :param changes: The changes keyed by object ObjectId. Each value is a
+                    dict with keys "old" and "new" (the field's values before
+                    and after the update) and "sources" (list of source names,
+                    or None if the type does not track sources).
+    :type changes: dict
+    """
+
+    # Check if the type is supported for notifications
+    if __supported_notification_types__.get(obj_type) is None or not changes:
+        return
+
+    sources = set()
+    for change in changes.itervalues():
+        sources.update(change.get('sources') or [])
+
+    query = {'$or': [{'subscriptions.%s.id' % obj_type: {'$in': changes.keys()}},
+                     {'subscriptions.Source.name': {'$in': list(sources)}}]}
+    fields = {'username': 1,
+              'sources': 1,
+              'subscriptions.%s.id' % obj_type: 1,
+              'subscriptions.Source.name': 1}
+    subscribers = []
+    for user in CRITsUser._get_collection().find(query, fields):
+        subscriptions = user.get('subscriptions', {})
+        subscribers.append((user['username'],
+                            set(user.get('sources', [])),
+                            set(s.get('id') for s in subscriptions.get(obj_type, [])),
+                            set(s.get('name') for s in subscriptions.get('Source', []))))
+    if not subscribers:
+        return
+
+    now = datetime.datetime.now()
+    version = Notification._meta['latest_schema_version']
+    notifications = []
+    for oid, change in changes.iteritems():
+        obj_sources = change.get('sources')
+        candidates = [sub for sub in subscribers
+                      if oid in sub[2] or
+                      (obj_sources and sub[3].intersection(obj_sources))]
+        if not candidates:
+            continue
+
+        message = "%s updated the following attributes: %s" % (username,
+                                                               changed_field)
+        result = process_changed_field(obj_type, changed_field,
+                                       change.get('old'), change.get('new'))
+        if result.get('message') is not None:
+            message += "\n" + result.get('message')
+        source_filter = result.get('source_filter')
+
+        users = set()
+        for name, allowed_sources, ids, source_names in candidates:
+            if obj_sources is None:
+                users.add(name)
+                continue
+
+            # Filter on users that have access to the source of the object
+            visible = allowed_sources.intersection(obj_sources)
+            if source_filter is not None:
+                visible = visible.intersection(source_filter)
+            if visible:
+                users.add(name)
+
+        users.discard(username) # don't notify the user creating this notification
+        if not users:
+            continue
+        notifications.append(Notification(analyst=username,
+                                          notification=html_escape(message),
+                                          notification_type=NotificationType.ALERT,
+                                          obj_id=oid,
+                                          obj_type=obj_type,
+                                          users=list(users),
+                                          created=now,
+                                          schema_version=version))
+
+    if not notifications:
+        return
+    Notification.objects.insert(notifications, load_bulk=False)
+
+    # Signal potentially waiting threads that notification information is available
+    for user in set(u for n in notifications for u in n.users):
+        notification_lock = NotificationLockManager.get_notification_lock(user)
+        notification_lock.acquire()
+
+        try:
+            notification_lock.notifyAll()
+        finally:
+            notification_lock.release()
+
 def combine_source_filters(current_source_filters, new_source_filters):
     """
     Combines sources together in a restrictive way, e.g. combines sources
@@ -281,50 +420,61 @@ def process_changed_fields(initial_message, changed_fields, obj):
         old_obj = class_from_id(obj_type, obj.id)
         old_value = getattr(old_obj, base_changed_field, '')
 
-        change_handler = ChangeParser.get_changed_field_handler(obj_type, base_changed_field)
+        change = process_changed_field(obj_type, base_changed_field,
+                                       old_value, new_value)
 
-        if change_handler is not None:
-            change_message = change_handler(old_value, new_value, base_changed_field)
+        if change.get('source_filter') is not None:
+            source_filter = combine_source_filters(source_filter,
+                                                   change.get('source_filter'))
 
-            if isinstance(change_message, dict):
-                if change_message.get('source_filter') is not None:
-                    new_source_filter = change_message.get('source_filter')
-                    source_filter = combine_source_filters(source_filter, new_source_filter)
+        if change.get('message') is not None:
+            message += "\n" + change.get('message')
 
-                change_message = change_message.get('message')
+    return {'message': message, 'source_filter': source_filter}
 
-            if change_message is not None:
-                message += "\n" + change_message[:1].capitalize() + change_message[1:]
-        else:
-            change_field_handler = ChangeParser.generic_single_field_change_handler
+def process_changed_field(obj_type, changed_field, old_value, new_value):
+    """
+    Processes a single changed field to determine what actually changed.
 
-            if isinstance(old_value, BaseList):
+    :param obj_type: The CRITs type of the object.
+    :type obj_type: str
+    :param changed_field: The name of the field that was changed.
+    :type changed_field: str
+    :param old_value: The value of the field before the change.
+    :param new_value: The value of the field after the change.
+    :returns: dict with keys "message" (str) and "source_filter" (list)
+    """
+
+    change_handler = ChangeParser.get_changed_field_handler(obj_type, changed_field)
 
-                list_value = None
+    if change_handler is None:
+        change_handler = ChangeParser.generic_single_field_change_handler
 
-                if len(old_value) > 0:
-                    list_value = old_value[0]
-                elif len(new_value) > 0:
-                    list_value = new_value[0]
+        if isinstance(old_value, list):
 
-                if isinstance(list_value, basestring):
-                    change_field_handler = ChangeParser.generic_list_change_handler
-                elif isinstance(list_value, EmbeddedDocument):
-                    change_field_handler = ChangeParser.generic_list_json_change_handler
+            list_value = None
 
-            change_message = change_field_handler(old_value, new_value, base_changed_field)
+            if len(old_value) > 0:
+                list_value = old_value[0]
+            elif len(new_value) > 0:
+                list_value = new_value[0]
 
-            if isinstance(change_message, dict):
-                if change_message.get('source_filter') is not None:
-                    new_source_filter = change_message.get('source_filter')
-                    combine_source_filters(source_filter, new_source_filter)
+            if isinstance(list_value, basestring):
+                change_handler = ChangeParser.generic_list_change_handler
+            elif isinstance(list_value, EmbeddedDocument):
+                change_handler = ChangeParser.generic_list_json_change_handler
 
-                change_message = change_message.get('message')
+    change_message = change_handler(old_value, new_value, changed_field)
+    source_filter = None
 
-            if change_message is not None:
-                message += "\n" + change_message[:1].capitalize() + change_message[1:]
+    if isinstance(change_message, dict):
+        source_filter = change_message.get('source_filter')
+        change_message = change_message.get('message')
 
-    return {'message': message, 'source_filter': source_filter}
+    if change_message is not None:
+        change_message = change_message[:1].capitalize() + change_message[1:]
+
+    return {'message': change_message, 'source_filter': source_filter}
 
 def get_notification_details(request, newer_than):
     """
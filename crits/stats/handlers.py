@@ -1,6 +1,8 @@
 from bson import Code
 import datetime
 
+from pymongo import UpdateOne
+
 from django.conf import settings
 from crits.core.mongo_tools import mongo_connector
 
@@ -94,17 +96,16 @@ def zero_campaign():
         'pcap_count': 0,
     }
 
-def update_results(collection, m, r, stat_query, field, campaign_stats):
+def update_results(collection, stat_query, field, campaign_stats):
     """
     Update campaign results.
 
+    Counts are grouped per campaign name server-side with a single
+    aggregation, which is much cheaper than a JavaScript mapreduce.
+
     :param collection: The collection to get campaign results for.
-    :type collection: str
-    :param m: The map.
-    :type m: :class:`bson.Code`
-    :param r: The reduce.
-    :type r: :clas:`bson.Code`
-    :param stat_query: The query to use in the mapreduce.
+    :type collection: :class:`pymongo.collection.Collection`
+    :param stat_query: The query to use in the aggregation.
     :type stat_query: dict
     :param field: The field to update.
     :type field: str
@@ -113,13 +114,16 @@ def update_results(collection, m, r, stat_query, field, campaign_stats):
     :returns: dict
     """
 
-    if collection.find().count() > 0:
-        results = collection.inline_map_reduce(m,r, query=stat_query)
-        for result in results:
-            if result["_id"] != None:
-                if result["_id"] not in campaign_stats:
-                    campaign_stats[result["_id"]] = zero_campaign()
-                campaign_stats[result["_id"]][field] = result["value"]["count"]
+    pipeline = [
+        {'$match': stat_query},
+        {'$unwind': '$campaign'},
+        {'$group': {'_id': '$campaign.name', 'count': {'$sum': 1}}},
+    ]
+    for result in collection.aggregate(pipeline):
+        if result["_id"] != None:
+            if result["_id"] not in campaign_stats:
+                campaign_stats[result["_id"]] = zero_campaign()
+            campaign_stats[result["_id"]][field] = result["count"]
     return campaign_stats
 
 def generate_campaign_stats(source_name=None):
@@ -130,7 +134,7 @@ def generate_campaign_stats(source_name=None):
     :type source_name: None, str
     """
 
-    # build the query used in the mapreduces
+    # build the query used in the aggregations
     stat_query = {}
     stat_query["campaign.name"] = {"$exists": "true"}
     if source_name:
@@ -152,41 +156,31 @@ def generate_campaign_stats(source_name=None):
     campaign_stats = {}
     for campaign in campaign_listing:
         campaign_stats[campaign["name"]] = zero_campaign()
-    mapcode = """
-    function() {
-            if ("campaign" in this) {
-                campaign_list = this.campaign; }
-            if (campaign_list.length > 0) {
-                campaign_list.forEach(function(c) {
-                    emit(c.name, {count: 1}); }); }
-        }
-    """
-    m = Code(mapcode, {})
-    r = Code('function(k,v) { var count = 0; v.forEach(function(v) { count += v["count"]; }); return {count: count}; }', {})
-    campaign_stats = update_results(actors, m, r, stat_query,
+    campaign_stats = update_results(actors, stat_query,
                                     "actor_count", campaign_stats)
-    campaign_stats = update_results(backdoors, m, r, stat_query,
+    campaign_stats = update_results(backdoors, stat_query,
                                     "backdoor_count", campaign_stats)
-    campaign_stats = update_results(domains, m, r, stat_query,
+    campaign_stats = update_results(domains, stat_query,
                                     "domain_count", campaign_stats)
-    campaign_stats = update_results(emails, m, r, stat_query,
+    campaign_stats = update_results(emails, stat_query,
                                     "email_count", campaign_stats)
-    campaign_stats = update_results(events, m, r, stat_query,
+    campaign_stats = update_results(events, stat_query,
                                     "event_count", campaign_stats)
-    campaign_stats = update_results(exploits, m, r, stat_query,
+    campaign_stats = update_results(exploits, stat_query,
                                     "exploit_count", campaign_stats)
-    campaign_stats = update_results(indicators, m, r, stat_query,
+    campaign_stats = update_results(indicators, stat_query,
                                     "indicator_count", campaign_stats)
-    campaign_stats = update_results(ips, m, r, stat_query,
+    campaign_stats = update_results(ips, stat_query,
                                     "ip_count", campaign_stats)
-    campaign_stats = update_results(pcaps, m, r, stat_query,
+    campaign_stats = update_results(pcaps, stat_query,
                                     "pcap_count", campaign_stats)
-    campaign_stats = update_results(samples, m, r, stat_query,
+    campaign_stats = update_results(samples, stat_query,
                                     "sample_count", campaign_stats)
-    # update all of the campaigns here
-    for campaign in campaign_stats.keys():
-        campaigns.update({"name": campaign},
-                         {"$set": campaign_stats[campaign]}, upsert=True)
+    # update all of the campaigns here in one round-trip
+    updates = [UpdateOne({"name": campaign}, {"$set": stats}, upsert=True)
+                for campaign, stats in campaign_stats.iteritems()]
+    if updates:
+        campaigns.bulk_write(updates, ordered=False)
 
 def generate_counts():
     """
@@ -242,7 +242,7 @@ def get_target_details(email_address, analyst):
 
     return template, args
 
-def get_campaign_targets(campaign, user):
+def get_campaign_targets(campaign, user, sources=None):
     """
     Get targets related to a specific campaign.
 
@@ -250,25 +250,29 @@ def get_campaign_targets(campaign, user):
     :type campaign: str
     :param user: The user requesting this information.
     :type user: str
+    :param sources: The user's sources, if the caller already has them.
+    :type sources: list
     :returns: list
     """
 
     # Searching for campaign targets
-    sourcefilt = user_sources(user)
-
-    # Get addresses from the 'to' field of emails attributed to this campaign
-    emails = Email.objects(source__name__in=sourcefilt,
-                           campaign__name=campaign).only('to')
+    sourcefilt = sources
+    if sourcefilt is None:
+        sourcefilt = user_sources(user)
+
+    # Get addresses from the 'to' field of emails attributed to this campaign.
+    # distinct() has the server hand back just the unique addresses instead
+    # of every Email document.
+    recipients = Email.objects(source__name__in=sourcefilt,
+                               campaign__name=campaign).distinct('to')
     addresses = {}
-    for email in emails:
-        for to in email['to']:
-            addresses[to.strip().lower()] = 1 # add the way it should be
-            addresses[to] = 1 # also add the way it is in the Email
+    for to in recipients:
+        addresses[to.strip().lower()] = 1 # add the way it should be
+        addresses[to] = 1 # also add the way it is in the Email
 
     # Get addresses of Targets attributed to this campaign
-    targets = Target.objects(campaign__name=campaign).only('email_address')
-    for target in targets:
-        addresses[target.email_address] = 1
+    for email_address in Target.objects(campaign__name=campaign).distinct('email_address'):
+        addresses[email_address] = 1
 
     uniq_addrs = addresses.keys()
     return uniq_addrs
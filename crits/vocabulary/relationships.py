@@ -68,76 +68,41 @@ class RelationshipTypes(vocab):
         :returns: str or None
         """
 
-        if relationship is None:
-            return None
-
-        if relationship == cls.COMPRESSED_FROM:
-            return cls.COMPRESSED_INTO
-        elif relationship == cls.COMPRESSED_INTO:
-            return cls.COMPRESSED_FROM
-        elif relationship == cls.CONNECTED_FROM:
-            return cls.CONNECTED_TO
-        elif relationship == cls.CONNECTED_TO:
-            return cls.CONNECTED_FROM
-        elif relationship == cls.CONTAINS:
-            return cls.CONTAINED_WITHIN
-        elif relationship == cls.CONTAINED_WITHIN:
-            return cls.CONTAINS
-        elif relationship == cls.CREATED:
-            return cls.CREATED_BY
-        elif relationship == cls.CREATED_BY:
-            return cls.CREATED
-        elif relationship == cls.DECODED:
-            return cls.DECODED_BY
-        elif relationship == cls.DECODED_BY:
-            return cls.DECODED
-        elif relationship == cls.DECRYPTED:
-            return cls.DECRYPTED_BY
-        elif relationship == cls.DECRYPTED_BY:
-            return cls.DECRYPTED
-        elif relationship == cls.DOWNLOADED:
-            return cls.DOWNLOADED_BY
-        elif relationship == cls.DOWNLOADED_BY:
-            return cls.DOWNLOADED
-        elif relationship == cls.DOWNLOADED_FROM:
-            return cls.DOWNLOADED_TO
-        elif relationship == cls.DOWNLOADED_TO:
-            return cls.DOWNLOADED_FROM
-        elif relationship == cls.DROPPED:
-            return cls.DROPPED_BY
-        elif relationship == cls.DROPPED_BY:
-            return cls.DROPPED
-        elif relationship == cls.INSTALLED:
-            return cls.INSTALLED_BY
-        elif relationship == cls.INSTALLED_BY:
-            return cls.INSTALLED
-        elif relationship == cls.LOADED_FROM:
-            return cls.LOADED_INTO
-        elif relationship == cls.LOADED_INTO:
-            return cls.LOADED_FROM
-        elif relationship == cls.PACKED_FROM:
-            return cls.PACKED_INTO
-        elif relationship == cls.PACKED_INTO:
-            return cls.PACKED_FROM
-        elif relationship == cls.RECEIVED_FROM:
-            return cls.SENT_TO
-        elif relationship == cls.SENT_TO:
-            return cls.RECEIVED_FROM
-        elif relationship == cls.REGISTERED:
-            return cls.REGISTERED_TO
-        elif relationship == cls.REGISTERED_TO:
-            return cls.REGISTERED
-        elif relationship == cls.RELATED_TO:
-            return cls.RELATED_TO
-        elif relationship == cls.RESOLVED_TO:
-            return cls.RESOLVED_TO
-        elif relationship == cls.SENT:
-            return cls.SENT_BY
-        elif relationship == cls.SENT_BY:
-            return cls.SENT
-        elif relationship == cls.SUB_DOMAIN_OF:
-            return cls.SUPRA_DOMAIN_OF
-        elif relationship == cls.SUPRA_DOMAIN_OF:
-            return cls.SUB_DOMAIN_OF
-        else:
-            return None
+        return cls._inverses.get(relationship)
+
+    @classmethod
+    def _build_inverses(cls):
+        """
+        Build the lookup table used by :meth:`inverse`. Each pair below is
+        a relationship and its inverse; the table maps both directions.
+
+        :returns: dict
+        """
+
+        pairs = (
+            (cls.COMPRESSED_FROM, cls.COMPRESSED_INTO),
+            (cls.CONNECTED_FROM, cls.CONNECTED_TO),
+            (cls.CONTAINS, cls.CONTAINED_WITHIN),
+            (cls.CREATED, cls.CREATED_BY),
+            (cls.DECODED, cls.DECODED_BY),
+            (cls.DECRYPTED, cls.DECRYPTED_BY),
+            (cls.DOWNLOADED, cls.DOWNLOADED_BY),
+            (cls.DOWNLOADED_FROM, cls.DOWNLOADED_TO),
+            (cls.DROPPED, cls.DROPPED_BY),
+            (cls.INSTALLED, cls.INSTALLED_BY),
+            (cls.LOADED_FROM, cls.LOADED_INTO),
+            (cls.PACKED_FROM, cls.PACKED_INTO),
+            (cls.RECEIVED_FROM, cls.SENT_TO),
+            (cls.REGISTERED, cls.REGISTERED_TO),
+            (cls.RELATED_TO, cls.RELATED_TO),
+            (cls.RESOLVED_TO, cls.RESOLVED_TO),
+            (cls.SENT, cls.SENT_BY),
+            (cls.SUB_DOMAIN_OF, cls.SUPRA_DOMAIN_OF),
+        )
+        inverses = {}
+        for relationship, inverse in pairs:
+            inverses[relationship] = inverse
+            inverses[inverse] = relationship
+        return inverses
+
+RelationshipTypes._inverses = RelationshipTypes._build_inverses()